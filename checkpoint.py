@@ -0,0 +1,163 @@
+from typing import Dict, Union, List, Optional, Tuple, Set, TYPE_CHECKING
+from logger_config import logger
+from datetime import date, datetime
+import json as json
+import os
+import shutil
+import time
+from os import path
+from run_manifest import atomic_write_text
+if TYPE_CHECKING:   # pandas is imported lazily, only when results are read back
+    import pandas as pd
+
+# a work unit is (scenario block index, security block index)
+UnitId = Tuple[int, int]
+# a priced pair is (security_id, (scenario_name, scenario_date))
+PairKey = Tuple[str, Tuple[str, date]]
+
+def plan_blocks(keys: List, block_size: int) -> List[List]:
+    block_size = max(1, int(block_size))
+    return [keys[i:i + block_size] for i in range(0, len(keys), block_size)]
+
+class ProgressTracker:
+    """Tracks completed pairs and reports throughput and ETA."""
+    def __init__(self, total_pairs: int, done_pairs: int = 0):
+        self.total_pairs = total_pairs
+        self.done_pairs = done_pairs
+        self.session_pairs = 0
+        self.start = time.monotonic()
+
+    def advance(self, n_pairs: int):
+        self.done_pairs += n_pairs
+        self.session_pairs += n_pairs
+
+    def throughput(self) -> float:
+        elapsed = time.monotonic() - self.start
+        return self.session_pairs / elapsed if elapsed > 0 else 0.0
+
+    def eta_seconds(self) -> Optional[float]:
+        rate = self.throughput()
+        if rate <= 0:
+            return None
+        return (self.total_pairs - self.done_pairs) / rate
+
+    def snapshot(self) -> Dict:
+        eta = self.eta_seconds()
+        return {
+            "pairs_done": self.done_pairs,
+            "pairs_total": self.total_pairs,
+            "pairs_per_sec": round(self.throughput(), 2),
+            "eta_seconds": None if eta is None else round(eta, 1),
+            "updated": datetime.now().isoformat(timespec="seconds"),
+        }
+
+    def __str__(self):
+        eta = self.eta_seconds()
+        eta_text = "n/a" if eta is None else f"{eta:.0f}s"
+        return (f"{self.done_pairs}/{self.total_pairs} pairs, "
+                f"{self.throughput():.1f} pairs/s, ETA {eta_text}")
+
+class RunCheckpoint:
+    """Stores finished work units of a run next to its results file.
+
+    Every (scenario block x security block) unit is written to its own CSV and
+    recorded in progress.json, both atomically, so a crashed run can be resumed
+    by skipping the units already on disk. Pairs that failed inside a unit are
+    recorded too, and a resumed run reprices just those. The checkpoint is only
+    reused when the run fingerprint (inputs and block sizes) matches.
+    """
+    def __init__(self, output_file: str, fingerprint: str, total_units: int):
+        self.folder = output_file + ".parts"
+        self.progress_file = path.join(self.folder, "progress.json")
+        self.fingerprint = fingerprint
+        self.total_units = total_units
+        self.completed: Set[UnitId] = set()
+        self.failed: Dict[UnitId, List[PairKey]] = {}
+
+    def unit_file(self, unit: UnitId) -> str:
+        return path.join(self.folder, f"unit_{unit[0]}_{unit[1]}.csv")
+
+    def reset(self):
+        if path.exists(self.folder):
+            shutil.rmtree(self.folder)
+        os.makedirs(self.folder)
+        self.completed = set()
+        self.failed = {}
+
+    def resume(self) -> bool:
+        """Loads completed units from a previous attempt; starts afresh if none match."""
+        try:
+            with open(self.progress_file, 'r') as f:
+                progress = json.load(f)
+        except Exception as e:
+            logger.info(f"No usable checkpoint in {self.folder} ({e}), starting a new run")
+            self.reset()
+            return False
+        if progress.get("fingerprint") != self.fingerprint:
+            logger.info(f"Checkpoint in {self.folder} was made for different inputs, starting a new run")
+            self.reset()
+            return False
+        self.completed = {tuple(unit) for unit in progress.get("completed", [])
+                          if path.exists(self.unit_file(tuple(unit)))}
+        self.failed = {tuple(entry["unit"]): [(sid, (name, date.fromisoformat(d))) for sid, name, d in entry["pairs"]]
+                       for entry in progress.get("failed", []) if tuple(entry["unit"]) in self.completed}
+        logger.info(f"Resuming run: {len(self.completed)}/{self.total_units} work units already done, "
+                    f"{self.n_failed()} failed pairs to retry")
+        return True
+
+    def is_done(self, unit: UnitId) -> bool:
+        return unit in self.completed
+
+    def failed_pairs(self, unit: UnitId) -> Set[PairKey]:
+        return set(self.failed.get(unit, []))
+
+    def n_failed(self) -> int:
+        return sum(len(pairs) for pairs in self.failed.values())
+
+    def _set_failed(self, unit: UnitId, failed: List[PairKey]):
+        if failed:
+            self.failed[unit] = list(failed)
+        else:
+            self.failed.pop(unit, None)
+
+    def commit_unit(self, unit: UnitId, results: 'pd.DataFrame', failed: List[PairKey], tracker: ProgressTracker):
+        atomic_write_text(self.unit_file(unit), results.to_csv(index=False))
+        self.completed.add(unit)
+        self._set_failed(unit, failed)
+        self.write_progress(tracker)
+
+    def append_unit(self, unit: UnitId, results: 'pd.DataFrame', failed: List[PairKey], tracker: ProgressTracker):
+        """Adds the rows of retried pairs to a completed unit; failed holds those still failing."""
+        import pandas as pd
+        if not results.empty:
+            combined = pd.concat([self.read_unit(unit), results], ignore_index=True)
+            atomic_write_text(self.unit_file(unit), combined.to_csv(index=False))
+        self._set_failed(unit, failed)
+        self.write_progress(tracker)
+
+    def write_progress(self, tracker: ProgressTracker):
+        progress = {
+            "fingerprint": self.fingerprint,
+            "units_done": len(self.completed),
+            "units_total": self.total_units,
+            "completed": sorted(list(unit) for unit in self.completed),
+            "failed": [{"unit": list(unit), "pairs": [[sid, name, d.isoformat()] for sid, (name, d) in pairs]}
+                       for unit, pairs in sorted(self.failed.items())],
+        }
+        progress.update(tracker.snapshot())
+        atomic_write_text(self.progress_file, json.dumps(progress, indent=2))
+
+    def read_unit(self, unit: UnitId) -> 'pd.DataFrame':
+        import pandas as pd
+        return pd.read_csv(self.unit_file(unit), dtype={"Security ID": str, "Scenario Name": str,
+                                                        "Scenario Date": str})
+
+    def collect(self, units: List[UnitId]) -> 'pd.DataFrame':
+        import pandas as pd
+        if not units:
+            return pd.DataFrame()
+        return pd.concat([self.read_unit(unit) for unit in units], ignore_index=True)
+
+    def cleanup(self):
+        if path.exists(self.folder):
+            shutil.rmtree(self.folder)
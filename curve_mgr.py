@@ -1,10 +1,8 @@
 from typing import Dict, Union, List, Optional, Tuple, Callable, NewType
 import numpy as np
-from logger_config import logger
+from logger_config import logger, configure_logging
 from datetime import date, timedelta
 from abc import ABC, abstractmethod
-from scipy.interpolate import interp1d
-from scipy.optimize import root_scalar
 import csv
 
 import securities as sec
@@ -21,6 +19,41 @@ SimpleCurve = crv.SimpleCurve
 
 Attributes = Dict[str, Union[str,float,int]]
 
+def iter_curves_from_csv(file_path, default_date: date = None):
+    """Yields the SimpleCurves of a curves.csv file, in file order.
+
+    Each curve is a header row <name, date, type> followed by <day offset, discount factor>
+    rows and ends at a blank row. A file may hold several snapshots of the same curve.
+    """
+    with open(file_path, 'r') as file:
+        reader = csv.reader(file)
+        curve_name = None
+        curve_date = default_date
+        curve_type = None
+        dates = []
+        values = []
+
+        for row in reader:
+            if not row:  # Blank row indicates end of current curve
+                if curve_name and dates and values:
+                    yield SimpleCurve(name=curve_name, date=curve_date, day_offsets=dates, dfs=values)
+                    curve_name = None
+                    dates = []
+                    values = []
+            elif curve_name is None:  # Header row containing curve name
+                curve_name = row[0]
+                curve_date = date.fromisoformat(row[1])
+                curve_type = row[2]
+            else:  # Data rows containing <date, discount factor>
+                the_date = int(row[0])
+                the_value = float(row[1])
+                dates.append(the_date)
+                values.append(the_value)
+
+        # Add the last curve if the file doesn't end with a blank row
+        if curve_name and dates and values:
+            yield SimpleCurve(name=curve_name, date=curve_date, day_offsets=dates, dfs=values)
+
 # Abstract Singleton Curve Manager
 # class CurveManager:
 #     """Singleton class managing curves."""
@@ -51,37 +84,9 @@ class CurveManager:
         
     def read_curves_from_csv(self, file_path):
         try:
-            with open(file_path, 'r') as file:
-                reader = csv.reader(file)
-                curve_name = None
-                curve_date = self.valuation_date
-                curve_type = None
-                dates = []
-                values = []
-
-                for row in reader:
-                    if not row:  # Blank row indicates end of current curve
-                        if curve_name and dates and values:
-                            curve = SimpleCurve(name=curve_name, date=curve_date, day_offsets=dates, dfs=values)
-                            self.add_curve(curve)
-                            curve_name = None
-                            dates = []
-                            values = []
-                    elif curve_name is None:  # Header row containing curve name
-                        curve_name = row[0]
-                        curve_date = date.fromisoformat(row[1])
-                        curve_type = row[2]
-                    else:  # Data rows containing <date, discount factor>
-                        the_date = int(row[0])
-                        the_value = float(row[1])
-                        dates.append(the_date)
-                        values.append(the_value)
-
-                # Add the last curve if the file doesn't end with a blank row
-                if curve_name and dates and values:
-                    curve = SimpleCurve(name=curve_name, date=curve_date, day_offsets=dates, dfs=values)
-                    self.add_curve(curve)
-                    
+            for curve in iter_curves_from_csv(file_path, self.valuation_date):
+                self.add_curve(curve)
+
             logger.info(f"Successfully read and added curves from CSV: {file_path}")
 
         except Exception as e:
@@ -98,6 +103,7 @@ class CurveManager:
     
 # Example usage:
 if __name__ == "__main__":
+    configure_logging()
     # Path to the curve file
     config_file = "./tests/curves.csv"
     
@@ -3,8 +3,6 @@ import numpy as np
 from logger_config import logger
 from datetime import date, timedelta
 from abc import ABC, abstractmethod
-from scipy.interpolate import interp1d
-from scipy.optimize import root_scalar
 import csv
 import bisect
 
@@ -71,6 +69,9 @@ class Curve:
             self.attributes = attributes
 
         def solve_for_df(self, curve: 'Curve', market_value: float, known_dfs: List[float]) -> float:
+               # scipy is only needed for bootstrapping, keep it out of the import path
+               from scipy.optimize import root_scalar
+
                def objective_function(df_n):
                    temp_curve = SimpleCurve(curve.dates.tolist(), known_dfs + [df_n])
                    market_state = {("temp_curve", self.attributes['maturity']): temp_curve}
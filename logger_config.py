@@ -1,31 +1,41 @@
-from genericpath import isfile
 import logging
 #import os
 from pathlib import Path
 from datetime import datetime
 
 # Configure logger
+# Importing this module has no side effects: handlers are attached by configure_logging(),
+# which the TaskDispatcher (or a script's __main__) calls once it knows where to log.
 logger = logging.getLogger('app_logger')
 logger.setLevel(logging.INFO)
+logger.addHandler(logging.NullHandler())
 
-# Create handlers
-log_file_path = Path('./Tests/', 'rmds.log')
-if log_file_path.exists(): log_file_path.unlink()
+def configure_logging(log_file_path='./tests/rmds.log', level=logging.INFO):
+    # Create handlers
+    log_file_path = Path(log_file_path)
+    log_file_path.parent.mkdir(parents=True, exist_ok=True)
 
-# if it already exists, archive it
-""" if log_file_path.exists():
-    log_file_path.rename(log_file_path.stem 
-                         + datetime.now().strftime("%Y%m%d.%H%M%S")
-                         + ".log")
-"""
-# file_handler will initiate a new log file
-file_handler = logging.FileHandler(log_file_path)
-file_handler.setLevel(logging.INFO)
+    # if it already exists, archive it
+    """ if log_file_path.exists():
+        log_file_path.rename(log_file_path.stem
+                             + datetime.now().strftime("%Y%m%d.%H%M%S")
+                             + ".log")
+    """
+    # drop handlers of an earlier configuration so re-configuring does not log twice
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.FileHandler):
+            handler.close()
+            logger.removeHandler(handler)
 
-# Create formatters and add them to handlers
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
+    # file_handler will initiate a new log file
+    file_handler = logging.FileHandler(log_file_path, mode='w')
+    file_handler.setLevel(level)
+    logger.setLevel(level)
 
-# Add handlers to the logger
-logger.addHandler(file_handler)
+    # Create formatters and add them to handlers
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    file_handler.setFormatter(formatter)
 
+    # Add handlers to the logger
+    logger.addHandler(file_handler)
+    return logger
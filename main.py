@@ -1,30 +1,52 @@
-from typing import Dict, Union, List, Optional, Tuple
-from logger_config import logger
+from typing import Dict, Union, List, Optional, Tuple, TYPE_CHECKING
+from logger_config import logger, configure_logging
 from datetime import date
 from abc import ABC, abstractmethod
-from scipy.interpolate import interp1d
-import pandas as pd
 import json as json
+if TYPE_CHECKING:   # pandas is imported lazily, only when results are built
+    import pandas as pd
 
 from curve_mgr import CurveManager
+from run_manifest import RunManifest, StalePairs
+from checkpoint import RunCheckpoint, ProgressTracker, plan_blocks
 import scenario as scen
 ScenarioManager = scen.ScenarioManager
 import sec_mgr  
 SecurityManager = sec_mgr.SecurityManager
 
 
+RESULT_COLUMNS = ["Security ID", "Scenario Name", "Scenario Date", "NPV_BASE", "NPV_UP", "NPV_DOWN"]
+
 # Generic Calculation Function
-def gen_rmds(sec_mgr: SecurityManager, scen_mgr: ScenarioManager) -> pd.DataFrame:
+def gen_rmds(sec_mgr: SecurityManager, scen_mgr: ScenarioManager, pairs: Optional[set] = None) -> 'pd.DataFrame':
+    """Prices every (security, scenario) pair, or only those in pairs when given."""
+    return price_block(sec_mgr.securities, scen_mgr.scenarios, pairs)
+
+def price_block(securities: Dict, scenarios: Dict, pairs: Optional[set] = None,
+                failed: Optional[list] = None) -> 'pd.DataFrame':
+    """Prices the cross product of the given securities and scenarios.
+
+    Pairs that raise are logged and left out; when failed is given they are appended to it
+    as (security_id, (scenario_name, scenario_date)).
+    """
+    import pandas as pd
     data_store = []
-    for (scenario_name, scenario_date), scenario in scen_mgr.scenarios.items():
-        for security_id, security in sec_mgr.securities.items():
+    for (scenario_name, scenario_date), scenario in scenarios.items():
+        # built once per scenario and dropped after it, generated scenarios do not keep them
+        curve_sets = None
+        for security_id, security in securities.items():
+            if pairs is not None and (security_id, (scenario_name, scenario_date)) not in pairs:
+                continue
             try:
+                if curve_sets is None:
+                    curve_sets = scenario.curve_sets()
+                base_curves, up_curves, down_curves = curve_sets
                 val_date = scenario.date
                 # cashflows are val_date dependent
                 security.schedule_cashflows(val_date)
-                base_npv = security.NPV(scenario.base_curves)
-                up_npv = security.NPV(scenario.up_curves)
-                down_npv = security.NPV(scenario.down_curves)
+                base_npv = security.NPV(base_curves)
+                up_npv = security.NPV(up_curves)
+                down_npv = security.NPV(down_curves)
                 data_store.append({
                     "Security ID": security_id,
                     "Scenario Name": scenario_name,
@@ -36,15 +58,21 @@ def gen_rmds(sec_mgr: SecurityManager, scen_mgr: ScenarioManager) -> pd.DataFram
                 logger.info(f"Calculated NPVs for Security: {security_id}, Scenario: {scenario_name}")
             except Exception as e:
                 logger.error(f"Error calculating NPV for Security: {security_id}, Scenario: {scenario_name}. Error: {e}")
-    return pd.DataFrame(data_store)
+                if failed is not None:
+                    failed.append((security_id, (scenario_name, scenario_date)))
+    return pd.DataFrame(data_store, columns=RESULT_COLUMNS)
 
 # Task Dispatcher
+import os
 from os import path
 class TaskDispatcher:
-    def __init__(self, config_file: str):
+    def __init__(self, config_file: str, resume: bool = False, log_file: Optional[str] = None):
+        self.resume = resume
         with open(config_file, 'r') as f:
             self.config = json.load(f)
         self.wk_folder = path.dirname(config_file)
+        # by default log next to the config; tools reading the config without running it pass their own
+        configure_logging(log_file or path.join(self.wk_folder, self.config.get("log_file", "rmds.log")))
         self.valuation_date = date.fromisoformat(self.config["valuation_date"])
         self.curve_manager = CurveManager()
         self.curve_manager.set_valuation_date(self.valuation_date)
@@ -65,12 +93,135 @@ class TaskDispatcher:
         security_file = self.config["security_definition_file"]
         self.sec_mgr.load_securities(path.join(self.wk_folder, security_file))
 
+    def apply_shard(self):
+        """Restricts the loaded securities and scenarios to the shard this config describes."""
+        shard = self.config["shard"]
+        security_ids = set(shard["security_ids"])
+        scenario_keys = {(name, date.fromisoformat(d)) for name, d in shard["scenarios"]}
+        missing = (security_ids - set(self.sec_mgr.securities)) | \
+                  {f"{name}|{d}" for name, d in scenario_keys if (name, d) not in self.scen_mgr.scenarios}
+        if missing:
+            raise ValueError(f"Shard {shard['id']} refers to inputs that were not loaded: {sorted(missing)[:5]}")
+        self.sec_mgr.securities = {sid: s for sid, s in self.sec_mgr.securities.items() if sid in security_ids}
+        self.scen_mgr.scenarios = {key: s for key, s in self.scen_mgr.scenarios.items() if key in scenario_keys}
+        logger.info(f"Running shard {shard['id']}: {len(self.sec_mgr.securities)} securities, "
+                    f"{len(self.scen_mgr.scenarios)} scenarios")
+
+    def build_manifest(self) -> RunManifest:
+        return RunManifest.from_inputs(self.sec_mgr.securities, self.curve_manager.curves,
+                                       list(self.scen_mgr.scenarios), self.scen_mgr.definition())
+
+    def load_prior_results(self, output_file: str, manifest: RunManifest) -> Tuple[Optional['pd.DataFrame'], Optional[StalePairs]]:
+        """Returns the cached results and the pairs to reprice, or (None, None) for a full run."""
+        import pandas as pd
+        prior = RunManifest.load(RunManifest.manifest_path(output_file))
+        if prior is None or not path.exists(output_file):
+            logger.info("No prior run manifest or results found, running the full cross product")
+            return None, None
+        cached = pd.read_csv(output_file, dtype={"Security ID": str, "Scenario Name": str, "Scenario Date": str})
+        scenario_keys = list(self.scen_mgr.scenarios)
+        dirty_secs, dirty_scens = manifest.dirty_inputs(prior, self.sec_mgr.securities, scenario_keys)
+        clean_secs = [sid for sid in self.sec_mgr.securities if sid not in dirty_secs]
+        clean_scens = {f"{name}|{d}": (name, d) for name, d in scenario_keys if (name, d) not in dirty_scens}
+
+        # keep only cached rows of current, unchanged pairs
+        cached_scens = cached["Scenario Name"] + "|" + cached["Scenario Date"]
+        cached = cached[cached["Security ID"].isin(set(clean_secs)) & cached_scens.isin(set(clean_scens))]
+        cached = cached.drop_duplicates(subset=["Security ID", "Scenario Name", "Scenario Date"])
+
+        # clean pairs without a cached row (e.g. failed last time) are repriced explicitly
+        missing = set()
+        if len(cached) < len(clean_secs) * len(clean_scens):
+            cached_by_scen = cached.groupby(cached_scens[cached.index])["Security ID"].agg(set).to_dict()
+            for scen_str, key in clean_scens.items():
+                for sid in set(clean_secs) - cached_by_scen.get(scen_str, set()):
+                    missing.add((sid, key))
+        pairs = StalePairs(dirty_secs, dirty_scens, missing)
+        logger.info(f"Incremental run: reusing {len(cached)} cached results; {len(dirty_secs)} dirty securities, "
+                    f"{len(dirty_scens)} dirty scenarios, {len(missing)} uncached pairs to reprice")
+        return cached, pairs
+
+    def merge_results(self, cached: 'pd.DataFrame', fresh: 'pd.DataFrame') -> 'pd.DataFrame':
+        """Combines cached and fresh results in the order a full run would produce them."""
+        import pandas as pd
+        return self.order_results(pd.concat([cached, fresh], ignore_index=True))
+
+    def order_results(self, results: 'pd.DataFrame') -> 'pd.DataFrame':
+        """Sorts results by scenario, then security, in loading order."""
+        order = {}
+        for (name, d) in self.scen_mgr.scenarios:
+            for sid in self.sec_mgr.securities:
+                order[(sid, name, str(d))] = len(order)
+        if results.empty:
+            return results
+        rank = [order[(sid, name, str(d))] for sid, name, d in
+                zip(results["Security ID"], results["Scenario Name"], results["Scenario Date"])]
+        return results.assign(_rank=rank).sort_values("_rank").drop(columns="_rank").reset_index(drop=True)
+
+    def run_blocks(self, output_file: str, manifest: RunManifest, pairs: Optional[StalePairs]) -> Tuple['pd.DataFrame', RunCheckpoint]:
+        """Prices (scenario block x security block) work units, checkpointing each one to disk."""
+        scen_blocks = plan_blocks(list(self.scen_mgr.scenarios), self.config.get("scenario_block_size", 100))
+        sec_blocks = plan_blocks(list(self.sec_mgr.securities), self.config.get("security_block_size", 500))
+        units = [(i, j) for i in range(len(scen_blocks)) for j in range(len(sec_blocks))]
+
+        def unit_pairs(unit) -> int:
+            scen_keys, sec_ids = scen_blocks[unit[0]], sec_blocks[unit[1]]
+            if pairs is None:
+                return len(scen_keys) * len(sec_ids)
+            return pairs.count(sec_ids, scen_keys)
+
+        fingerprint = f"{manifest.digest()}:{len(scen_blocks)}x{len(sec_blocks)}"
+        checkpoint = RunCheckpoint(output_file, fingerprint, len(units))
+        if self.resume:
+            checkpoint.resume()
+        else:
+            checkpoint.reset()
+        tracker = ProgressTracker(sum(unit_pairs(unit) for unit in units),
+                                  sum(unit_pairs(unit) for unit in units if checkpoint.is_done(unit)))
+
+        for unit in units:
+            scenarios = {key: self.scen_mgr.scenarios[key] for key in scen_blocks[unit[0]]}
+            securities = {sid: self.sec_mgr.securities[sid] for sid in sec_blocks[unit[1]]}
+            failed = []
+            if checkpoint.is_done(unit):
+                # a resumed unit only reprices the pairs that failed in the earlier attempt
+                retry = checkpoint.failed_pairs(unit)
+                if not retry:
+                    continue
+                block_results = price_block(securities, scenarios, retry, failed)
+                checkpoint.append_unit(unit, block_results, failed, tracker)
+                logger.info(f"Work unit {unit}: retried {len(retry)} failed pairs, {len(failed)} still failing")
+                continue
+            block_results = price_block(securities, scenarios, pairs, failed)
+            tracker.advance(unit_pairs(unit))
+            checkpoint.commit_unit(unit, block_results, failed, tracker)
+            logger.info(f"Work unit {unit} done ({len(checkpoint.completed)}/{len(units)} units): {tracker}")
+
+        # unit files follow the block layout; results always follow the single-block order
+        return self.order_results(checkpoint.collect(units)), checkpoint
+
     def execute_use_case(self):
         use_case = self.config["use_case"]
         if use_case == "NPV_CALCULATION":
-            results = gen_rmds(self.sec_mgr, self.scen_mgr)
-            results.to_csv(path.join(self.wk_folder, self.config["output_file"]), index=False)
+            output_file = path.join(self.wk_folder, self.config["output_file"])
+            manifest = self.build_manifest()
+            cached, pairs = None, None
+            if self.config.get("incremental", False):
+                cached, pairs = self.load_prior_results(output_file, manifest)
+            results, checkpoint = self.run_blocks(output_file, manifest, pairs)
+            if cached is not None:
+                results = self.merge_results(cached, results)
+            tmp_file = output_file + ".tmp"
+            results.to_csv(tmp_file, index=False)
+            os.replace(tmp_file, output_file)
+            manifest.save(RunManifest.manifest_path(output_file))
             logger.info(f"Results saved to {self.config['output_file']}")
+            n_failed = checkpoint.n_failed()
+            if n_failed:
+                # keep the checkpoint so that --resume reprices only the failed pairs
+                raise RuntimeError(f"{n_failed} pairs failed and are missing from {self.config['output_file']}; "
+                                   f"rerun with --resume to retry them")
+            checkpoint.cleanup()
 
     def run(self):
         try:
@@ -81,19 +232,27 @@ class TaskDispatcher:
             logger.info("Scenarios loaded")
             self.load_securities()
             logger.info("Securities loaded")
+            if "shard" in self.config:
+                self.apply_shard()
             self.execute_use_case()
             logger.info("Task Dispatcher completed successfully.")
         except Exception as e:
             logger.error(f"Task Dispatcher encountered an error: {e}")
+            raise
 
 # Example Usage
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run the RMDS task dispatcher")
     # Path to the configuration file
-    config_file = "./tests/config.json"
+    parser.add_argument("config_file", nargs="?", default="./tests/config.json")
     #config_file = "./rmds/tests/config.json"
-    
+    parser.add_argument("--resume", action="store_true",
+                        help="skip work units already completed by an interrupted run")
+    args = parser.parse_args()
+
     # Initialize and run the TaskDispatcher
-    dispatcher = TaskDispatcher(config_file)
+    dispatcher = TaskDispatcher(args.config_file, resume=args.resume)
     dispatcher.run()
     
\ No newline at end of file
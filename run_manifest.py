@@ -0,0 +1,154 @@
+from typing import Dict, Union, List, Optional, Tuple, Set
+from logger_config import logger
+from datetime import date
+import hashlib
+import json as json
+import os
+from os import path
+
+import curves as crv
+Curve = crv.Curve
+import securities as sec
+Security = sec.Security
+
+def _digest(payload) -> str:
+    text = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def atomic_write_text(file_path: str, text: str):
+    """Writes text to a temp file and renames it over file_path, so readers never see a partial file."""
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+
+def _curve_key(key: Tuple[str, date]) -> str:
+    return f"{key[0]}|{key[1]}"
+
+def _scenario_key(key: Tuple[str, date]) -> str:
+    return f"{key[0]}|{key[1]}"
+
+class RunManifest:
+    """Content-hash fingerprints of the inputs that produced a results file.
+
+    The manifest records one hash per security row, per curve and per scenario.
+    Diffing the manifest of the current inputs against the one saved by the
+    previous run tells which (security, scenario) pairs need repricing.
+    """
+    def __init__(self, securities: Dict[str, str] = None, curves: Dict[str, str] = None,
+                 scenarios: Dict[str, str] = None):
+        self.securities: Dict[str, str] = securities or {}
+        self.curves: Dict[str, str] = curves or {}
+        self.scenarios: Dict[str, str] = scenarios or {}
+
+    @staticmethod
+    def fingerprint_security(security: Security) -> str:
+        return _digest({"type": security.type, "attributes": security.attributes})
+
+    @staticmethod
+    def fingerprint_curve(curve: Curve) -> str:
+        return _digest({"name": curve.name, "date": curve.date, "class": type(curve).__name__,
+                        "day_offsets": [int(d) for d in curve.day_offsets],
+                        "dfs": [float(v) for v in curve.dfs]})
+
+    @staticmethod
+    def fingerprint_scenario(name: str, a_date: date, scenario_config: Dict) -> str:
+        return _digest({"name": name, "date": a_date, "definition": scenario_config})
+
+    @classmethod
+    def from_inputs(cls, securities: Dict[str, Security], curves: Dict[Tuple[str, date], Curve],
+                    scenario_keys: List[Tuple[str, date]], scenario_config: Dict) -> 'RunManifest':
+        manifest = cls()
+        for security_id, security in securities.items():
+            manifest.securities[security_id] = cls.fingerprint_security(security)
+        for key, curve in curves.items():
+            manifest.curves[_curve_key(key)] = cls.fingerprint_curve(curve)
+        for name, a_date in scenario_keys:
+            manifest.scenarios[_scenario_key((name, a_date))] = cls.fingerprint_scenario(name, a_date, scenario_config)
+        return manifest
+
+    def digest(self) -> str:
+        return _digest({"securities": self.securities, "curves": self.curves, "scenarios": self.scenarios})
+
+    @staticmethod
+    def manifest_path(results_file: str) -> str:
+        return results_file + ".manifest.json"
+
+    @classmethod
+    def load(cls, file_path: str) -> Optional['RunManifest']:
+        if not path.exists(file_path):
+            return None
+        try:
+            with open(file_path, 'r') as f:
+                data = json.load(f)
+            return cls(data.get("securities"), data.get("curves"), data.get("scenarios"))
+        except Exception as e:
+            logger.error(f"Error reading run manifest {file_path}: {e}")
+            return None
+
+    def save(self, file_path: str):
+        atomic_write_text(file_path, json.dumps({"securities": self.securities, "curves": self.curves,
+                                                 "scenarios": self.scenarios}, indent=2, sort_keys=True))
+        logger.info(f"Run manifest saved to {file_path}")
+
+    def changed_curves(self, prior: 'RunManifest') -> Set[str]:
+        changed = {key for key, digest in self.curves.items() if prior.curves.get(key) != digest}
+        removed = set(prior.curves) - set(self.curves)
+        return changed | removed
+
+    def dirty_inputs(self, prior: 'RunManifest', securities: Dict[str, Security],
+                     scenario_keys: List[Tuple[str, date]]) -> Tuple[Set[str], Set[Tuple[str, date]]]:
+        """Returns the securities and the scenarios whose inputs differ from the prior run.
+
+        A security is dirty when its row or any curve it depends on changed; securities that
+        cannot name their curves are treated as depending on every curve. A scenario is dirty
+        when its definition changed. A pair needs repricing if either side is dirty.
+        """
+        changed_curves = self.changed_curves(prior)
+        changed_curve_names = {key.split("|")[0] for key in changed_curves}
+        dirty_scenarios = {key for key in scenario_keys
+                           if prior.scenarios.get(_scenario_key(key)) != self.scenarios.get(_scenario_key(key))}
+
+        dirty_securities = set()
+        for security_id, security in securities.items():
+            if prior.securities.get(security_id) != self.securities.get(security_id):
+                dirty_securities.add(security_id)
+                continue
+            try:
+                if changed_curve_names.intersection(security.require_curves()):
+                    dirty_securities.add(security_id)
+            except Exception:
+                if changed_curves:
+                    dirty_securities.add(security_id)
+        return dirty_securities, dirty_scenarios
+
+class StalePairs:
+    """The (security_id, scenario_key) pairs an incremental run has to reprice.
+
+    Kept as dirty securities and dirty scenarios, whose cross products are implied, plus the
+    explicit clean pairs that have no cached row, so memory does not grow with
+    securities x scenarios.
+    """
+    def __init__(self, dirty_securities: Set[str], dirty_scenarios: Set[Tuple[str, date]],
+                 missing: Set[Tuple[str, Tuple[str, date]]] = None):
+        self.dirty_securities = dirty_securities
+        self.dirty_scenarios = dirty_scenarios
+        self.missing = missing or set()
+
+    def __contains__(self, pair: Tuple[str, Tuple[str, date]]) -> bool:
+        security_id, scenario_key = pair
+        return security_id in self.dirty_securities or scenario_key in self.dirty_scenarios or pair in self.missing
+
+    def count(self, security_ids: List[str], scenario_keys: List[Tuple[str, date]]) -> int:
+        """Number of stale pairs in the cross product of the given securities and scenarios."""
+        n_dirty_secs = sum(sid in self.dirty_securities for sid in security_ids)
+        n_dirty_scens = sum(key in self.dirty_scenarios for key in scenario_keys)
+        n_implied = n_dirty_secs * len(scenario_keys) + (len(security_ids) - n_dirty_secs) * n_dirty_scens
+        if not self.missing:
+            return n_implied
+        sec_set, scen_set = set(security_ids), set(scenario_keys)
+        n_missing = sum(sid in sec_set and key in scen_set and sid not in self.dirty_securities
+                        and key not in self.dirty_scenarios for sid, key in self.missing)
+        return n_implied + n_missing
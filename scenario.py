@@ -1,15 +1,21 @@
 from typing import Dict, Union, List, Optional, Tuple
-from logger_config import logger
+from logger_config import logger, configure_logging
 from datetime import date
 from abc import ABC, abstractmethod
-from scipy.interpolate import interp1d
 import json as json
+from os import path
+import numpy as np
 
 import curves as crv
 Curve = crv.Curve
 from curve_mgr import CurveManager
 ZeroCurve = crv.ZeroCurve
 SimpleCurve = crv.SimpleCurve
+from scenario_gen import ScenarioGenerator, file_digest
+
+# discount factor multipliers of the UP and DOWN perturbations
+UP_DF_FACTOR = 1.1
+DOWN_DF_FACTOR = 0.9
 
 class Scenario:
     """Class representing a market scenario with BASE, UP, and DOWN perturbed curves."""
@@ -27,16 +33,54 @@ class Scenario:
         for key, curve in self.base_curves.items():
             '''
             '''
-            up_values = [v * 1.1 for v in curve.dfs]
-            down_values = [v * 0.9 for v in curve.dfs]
+            up_values = [v * UP_DF_FACTOR for v in curve.dfs]
+            down_values = [v * DOWN_DF_FACTOR for v in curve.dfs]
             self.up_curves[key] = SimpleCurve(curve.name, curve.date, curve.day_offsets, up_values)
             self.down_curves[key] = SimpleCurve(curve.name, curve.date, curve.day_offsets, down_values)
 
+    def curve_sets(self) -> Tuple[Dict[Tuple[str, date], Curve], ...]:
+        """The BASE, UP and DOWN curves to price this scenario with."""
+        return self.base_curves, self.up_curves, self.down_curves
+
+
+class GeneratedScenario(Scenario):
+    """A scenario whose base discount factors are row views into generator output.
+
+    Curves are built each time the scenario is priced and not kept, so a large scenario
+    set only ever holds the generated matrices plus the curves of the scenario in hand.
+    """
+    def __init__(self, name: str, a_date: date, template_curves: Dict[Tuple[str,date], Curve],
+                 shocked_dfs: Dict[Tuple[str,date], np.ndarray], idx: int):
+        self.name = name
+        self.date = a_date
+        self._template_curves = template_curves
+        self.shocked_dfs = {key: dfs[idx] for key, dfs in shocked_dfs.items()}
+
+    def _build_curves(self, factor: float) -> Dict[Tuple[str, date], Curve]:
+        return {key: SimpleCurve(curve.name, curve.date, curve.day_offsets, self.shocked_dfs[key] * factor)
+                for key, curve in self._template_curves.items()}
+
+    def curve_sets(self) -> Tuple[Dict[Tuple[str, date], Curve], ...]:
+        return self._build_curves(1.0), self._build_curves(UP_DF_FACTOR), self._build_curves(DOWN_DF_FACTOR)
+
+    @property
+    def base_curves(self) -> Dict[Tuple[str, date], Curve]:
+        return self._build_curves(1.0)
+
+    @property
+    def up_curves(self) -> Dict[Tuple[str, date], Curve]:
+        return self._build_curves(UP_DF_FACTOR)
+
+    @property
+    def down_curves(self) -> Dict[Tuple[str, date], Curve]:
+        return self._build_curves(DOWN_DF_FACTOR)
+
 
 class ScenarioManager:
     """Singleton class managing scenarios."""
     _instance = None
     scenarios: Dict[Tuple[str, date], Scenario] = {}
+    history_digest: str = None
 
     def __new__(cls):
         if cls._instance is None:
@@ -60,6 +104,38 @@ class ScenarioManager:
     def define_scen_grid(self, ir_perturb_bps: float, ir_risk_factors: List):
         pass
 
+    def generate_scenarios(self, gen_def: Dict, ir_risk_factors: List, wk_folder: str):
+        """Creates historical or PCA-simulated scenarios from a curve history file.
+
+        gen_def keys: history_file, method ("historical" or "simulated"), n_scenarios,
+        n_components, seed and horizon_days.
+        """
+        history_file = path.join(wk_folder, gen_def["history_file"])
+        self.history_digest = file_digest(history_file)
+        generator = ScenarioGenerator(ir_risk_factors, gen_def.get("seed", 42))
+        generator.load_history(history_file)
+        method = gen_def.get("method", "historical")
+        cube = generator.generate(method, gen_def.get("n_scenarios"), gen_def.get("n_components"),
+                                  gen_def.get("horizon_days", 1))
+
+        base_curves = CurveManager().curves
+        shocked_dfs = generator.shock_curves(cube, base_curves)
+        prefix = "HIST" if method == "historical" else "SIM"
+        width = len(str(len(cube)))
+        for i in range(len(cube)):
+            name = f"{prefix}_{i + 1:0{width}d}"
+            self.scenarios[(name, self.valuation_date)] = GeneratedScenario(name, self.valuation_date,
+                                                                            base_curves, shocked_dfs, i)
+        self.shift_cube = cube
+        logger.info(f"Generated {len(cube)} {method} scenarios from {history_file}")
+
+    def definition(self) -> Dict:
+        """The scenario definition, including the content of any curve history it reads."""
+        definition = dict(self.config)
+        if self.history_digest:
+            definition["history_digest"] = self.history_digest
+        return definition
+
     def load_scenarios(self, scenario_file):
         ''' read the scenario definition and create lists of shocks/perturbations
             1. given IR/CR/EQ perturbation amount and list of risk factors, create perturbation list
@@ -68,6 +144,7 @@ class ScenarioManager:
         '''
         with open(scenario_file, 'r') as f:
             self.config = json.load(f)
+        self.history_digest = None
 
         ir_perturb_bps = self.config.get("IR_perturb_bps", 10)
         ir_risk_factors = self.config.get("IR_risk_factors", [])
@@ -79,8 +156,13 @@ class ScenarioManager:
         logger.info(f"Start loading scenarios: first the BASE curves")
         self.create_scenario("BASE", self.valuation_date)
 
+        gen_def = self.config.get("scenario_generator")
+        if gen_def:
+            self.generate_scenarios(gen_def, ir_risk_factors, path.dirname(scenario_file))
+
 # Example usage:
 if __name__ == "__main__":
+    configure_logging()
     # Path to the curve file
     crv_file = "./tests/curves.csv"
     scen_file = "./tests/scenarios.json"
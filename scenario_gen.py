@@ -0,0 +1,176 @@
+from typing import Dict, Union, List, Optional, Tuple
+from logger_config import logger, configure_logging
+from datetime import date
+import hashlib
+import numpy as np
+
+import curves as crv
+Curve = crv.Curve
+from curve_mgr import iter_curves_from_csv
+
+DAYS_PER_YEAR = 365.0
+
+def tenor_to_days(tenor: str) -> int:
+    """Converts a risk factor tenor such as "3m" or "10y" to a day offset."""
+    units = {"d": 1, "w": 7, "m": 30, "y": 365}
+    tenor = tenor.strip().lower()
+    if not tenor or tenor[-1] not in units:
+        raise ValueError(f"Unknown tenor: {tenor}")
+    return int(float(tenor[:-1]) * units[tenor[-1]])
+
+def file_digest(file_path: str) -> str:
+    with open(file_path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+class ScenarioGenerator:
+    """Vectorized historical and PCA scenario generator for IR curves.
+
+    History snapshots are turned into zero rates at the risk factor tenors, shape
+    (n_dates, n_curves, n_tenors). Daily shifts of these rates are either resampled
+    (historical) or drawn from their principal components (simulated), giving one
+    (n_scenarios, n_curves, n_tenors) shift cube. shock_curves applies the cube to the
+    base curves, producing one (n_scenarios, n_offsets) discount factor matrix per curve.
+    """
+    def __init__(self, ir_risk_factors: List[str], seed: int = 42):
+        self.tenors = list(ir_risk_factors)
+        self.tenor_days = np.array([tenor_to_days(t) for t in self.tenors], dtype=float)
+        # shock_curves interpolates over the tenors, which np.interp needs strictly increasing
+        if len(self.tenor_days) == 0 or np.any(np.diff(self.tenor_days) <= 0):
+            raise ValueError(f"IR risk factor tenors must be non-empty and strictly increasing: {self.tenors}")
+        self.rng = np.random.default_rng(seed)
+        self.curve_names: List[str] = []
+        self.dates: List[date] = []
+        self.zero_rates: np.ndarray = None
+
+    def zero_rates_of(self, curve: Curve) -> np.ndarray:
+        last_offset = curve.day_offsets[-1]
+        for tenor, days in zip(self.tenors, self.tenor_days):
+            if days > last_offset:
+                raise ValueError(f"Curve {curve.name} on {curve.date} ends at day {last_offset}, "
+                                 f"before risk factor tenor {tenor} ({int(days)} days)")
+        dfs = np.array([curve.get_df(int(d)) for d in self.tenor_days], dtype=float)
+        return -np.log(dfs) / (self.tenor_days / DAYS_PER_YEAR)
+
+    def load_history(self, history_file: str):
+        """Reads curve snapshots in curves.csv format and builds the zero rate history."""
+        snapshots: Dict[date, Dict[str, Curve]] = {}
+        for curve in iter_curves_from_csv(history_file):
+            snapshots.setdefault(curve.date, {})[curve.name] = curve
+
+        # only curves quoted on every date can be shifted together
+        names = None
+        for curves in snapshots.values():
+            names = set(curves) if names is None else names & set(curves)
+        self.curve_names = sorted(names or [])
+        self.dates = sorted(snapshots)
+        if len(self.dates) < 2 or not self.curve_names:
+            raise ValueError(f"Curve history {history_file} needs at least two dates with common curves")
+
+        self.zero_rates = np.array([[self.zero_rates_of(snapshots[d][name]) for name in self.curve_names]
+                                    for d in self.dates])
+        logger.info(f"Loaded curve history {history_file}: {len(self.dates)} dates, curves {self.curve_names}")
+
+    def daily_shifts(self) -> np.ndarray:
+        return np.diff(self.zero_rates, axis=0)
+
+    @staticmethod
+    def pca(shifts: np.ndarray, n_components: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns mean, components (k, n_curves * n_tenors) and component variances of the shifts."""
+        flat = shifts.reshape(len(shifts), -1)
+        mean = flat.mean(axis=0)
+        _, sing, vt = np.linalg.svd(flat - mean, full_matrices=False)
+        k = max(1, min(n_components, len(sing)))
+        variances = sing[:k] ** 2 / max(len(flat) - 1, 1)
+        return mean, vt[:k], variances
+
+    def historical(self, n_scenarios: Optional[int] = None, n_components: Optional[int] = None) -> np.ndarray:
+        """Historical shifts, resampled with the fixed seed when n_scenarios is given.
+
+        With n_components the shifts are first projected onto their leading principal components.
+        """
+        shifts = self.daily_shifts()
+        if n_components:
+            mean, comps, _ = self.pca(shifts, n_components)
+            flat = shifts.reshape(len(shifts), -1)
+            shifts = (mean + ((flat - mean) @ comps.T) @ comps).reshape(shifts.shape)
+        if n_scenarios is None:
+            return shifts
+        idx = self.rng.integers(0, len(shifts), size=n_scenarios)
+        return shifts[idx]
+
+    def simulated(self, n_scenarios: int, n_components: int = 3) -> np.ndarray:
+        """Gaussian shifts drawn from the leading principal components of the history."""
+        shifts = self.daily_shifts()
+        mean, comps, variances = self.pca(shifts, n_components)
+        z = self.rng.standard_normal((n_scenarios, len(variances))) * np.sqrt(variances)
+        return (mean + z @ comps).reshape((n_scenarios,) + shifts.shape[1:])
+
+    def generate(self, method: str, n_scenarios: Optional[int] = None, n_components: Optional[int] = None,
+                 horizon_days: int = 1) -> np.ndarray:
+        """Shift cube for the given method, scaled from daily shifts to horizon_days.
+
+        The mean daily shift (drift) grows linearly with the horizon, the deviations around it
+        with the square root of the horizon.
+        """
+        if method == "historical":
+            cube = self.historical(n_scenarios, n_components)
+        elif method == "simulated":
+            cube = self.simulated(n_scenarios or len(self.daily_shifts()), n_components or 3)
+        else:
+            raise ValueError(f"Unknown scenario generation method: {method}")
+        if horizon_days == 1:
+            return cube
+        drift = self.daily_shifts().mean(axis=0)
+        return drift * horizon_days + (cube - drift) * np.sqrt(horizon_days)
+
+    def shock_curves(self, cube: np.ndarray, base_curves: Dict[Tuple[str, date], Curve]) -> Dict[Tuple[str, date], np.ndarray]:
+        """Applies the zero rate shift cube to the base curves.
+
+        Shifts are linearly interpolated from the tenors onto each curve's day offsets (flat outside)
+        and applied as df * exp(-shift * t). Curves without history are left unshocked.
+        """
+        shocked = {}
+        for key, curve in base_curves.items():
+            offsets = np.asarray(curve.day_offsets, dtype=float)
+            if curve.name in self.curve_names:
+                # (n_offsets, n_tenors) interpolation weights: shift on grid = shift at tenors @ weights.T
+                weights = np.array([np.interp(offsets, self.tenor_days, np.eye(len(self.tenor_days))[j])
+                                    for j in range(len(self.tenor_days))]).T
+                grid_shifts = cube[:, self.curve_names.index(curve.name), :] @ weights.T
+                shocked[key] = np.asarray(curve.dfs, dtype=float) * np.exp(-grid_shifts * offsets / DAYS_PER_YEAR)
+            else:
+                shocked[key] = np.broadcast_to(np.asarray(curve.dfs, dtype=float), (len(cube), len(offsets)))
+        return shocked
+
+# Example usage:
+if __name__ == "__main__":
+    configure_logging()
+    from curve_mgr import CurveManager
+    from datetime import timedelta
+    import tempfile, os
+
+    crv_file = "./tests/curves.csv"
+    val_date = date(2020, 12, 30)
+    manager = CurveManager()
+    manager.set_valuation_date(val_date)
+    manager.load_curves(crv_file)
+
+    # write a synthetic 30 day history by jittering the base curves
+    rng = np.random.default_rng(0)
+    history_file = os.path.join(tempfile.mkdtemp(), "curve_history.csv")
+    with open(history_file, 'w') as f:
+        for i in range(30):
+            for curve in manager.curves.values():
+                f.write(f"{curve.name},{(val_date - timedelta(days=30 - i)).isoformat()},SimpleCurve\n")
+                bump = rng.normal(0, 0.0005)
+                for d, v in zip(curve.day_offsets, curve.dfs):
+                    f.write(f"{int(d)},{v * np.exp(-bump * d / DAYS_PER_YEAR)}\n")
+                f.write("\n")
+
+    gen = ScenarioGenerator(["2y", "3y", "5y", "7y", "10y", "20y", "30y"], seed=42)
+    gen.load_history(history_file)
+    cube = gen.generate("simulated", n_scenarios=10000, n_components=3)
+    print(cube.shape)
+    shocked = gen.shock_curves(cube, manager.curves)
+    for key, dfs in shocked.items():
+        print(key, dfs.shape)
@@ -1,8 +1,7 @@
 from typing import Dict, Union, List, Optional, Tuple, NewType
-from logger_config import logger
+from logger_config import logger, configure_logging
 from datetime import date
 from abc import ABC, abstractmethod
-from scipy.interpolate import interp1d
 import csv
 
 import securities as sec
@@ -82,6 +81,7 @@ class SecurityManager:
 
 # Example usage:
 if __name__ == "__main__":
+    configure_logging()
     # Path to the curve file
     crv_file = "./tests/curves.csv"
     sec_file = "./tests/securities.tsv"
@@ -0,0 +1,254 @@
+from typing import Dict, Union, List, Optional, Tuple, TYPE_CHECKING
+from logger_config import logger, configure_logging
+from datetime import date
+import hashlib
+import json as json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from os import path
+
+from run_manifest import RunManifest
+if TYPE_CHECKING:   # pandas is imported lazily, only when shard results are merged
+    import pandas as pd
+
+PLAN_FILE = "shard_plan.json"
+
+def stable_hash(key: str) -> int:
+    """Process independent hash of a key (unlike hash(), which is salted per interpreter)."""
+    return int(hashlib.md5(key.encode("utf-8")).hexdigest()[:12], 16)
+
+def estimate_cost(security, val_date: date) -> int:
+    """Estimated pricing cost of a security: its number of scheduled cashflows, at least 1."""
+    try:
+        security.schedule_cashflows(val_date)
+    except Exception as e:
+        logger.info(f"Could not schedule cashflows of {security.security_id} for cost estimation: {e}")
+    return max(1, len(getattr(security, "cashflow_dates", None) or []))
+
+def balance_groups(group_costs: Dict[str, int], n_shards: int) -> List[List[str]]:
+    """Assigns groups to n_shards by longest-processing-time-first on the estimated cost.
+
+    Ties are broken by a stable hash of the group key so the plan is reproducible.
+    """
+    shards: List[List[str]] = [[] for _ in range(n_shards)]
+    loads = [0] * n_shards
+    for key in sorted(group_costs, key=lambda k: (-group_costs[k], stable_hash(k))):
+        target = min(range(n_shards), key=lambda i: (loads[i], i))
+        shards[target].append(key)
+        loads[target] += group_costs[key]
+    return shards
+
+class ShardPlanner:
+    """Splits a TaskDispatcher run into shards of (security group x scenario block).
+
+    Securities are grouped by SecId or by Portfolio and the groups balanced across
+    n_security_shards on estimated cost; scenarios are cut into n_scenario_shards
+    contiguous blocks. Every shard is written as a dispatcher config file that runs
+    on its own with `python main.py <shard config>`.
+    """
+    def __init__(self, dispatcher, by: str = "SecId"):
+        if by not in ("SecId", "Portfolio"):
+            raise ValueError(f"Shards can be split by SecId or Portfolio, not {by}")
+        self.dispatcher = dispatcher
+        self.by = by
+
+    def security_shards(self, n_shards: int) -> List[List[str]]:
+        securities = self.dispatcher.sec_mgr.securities
+        groups: Dict[str, List[str]] = {}
+        costs: Dict[str, int] = {}
+        for security_id, security in securities.items():
+            key = security_id if self.by == "SecId" else str(security.attributes.get("Portfolio"))
+            groups.setdefault(key, []).append(security_id)
+            costs[key] = costs.get(key, 0) + estimate_cost(security, self.dispatcher.valuation_date)
+        shards = balance_groups(costs, n_shards)
+        # keep the single-node order of securities within a shard
+        order = {security_id: i for i, security_id in enumerate(securities)}
+        return [sorted((sid for key in shard for sid in groups[key]), key=order.get) for shard in shards]
+
+    def scenario_shards(self, n_shards: int) -> List[List[Tuple[str, date]]]:
+        keys = list(self.dispatcher.scen_mgr.scenarios)
+        bounds = [round(i * len(keys) / n_shards) for i in range(n_shards + 1)]
+        return [keys[bounds[i]:bounds[i + 1]] for i in range(n_shards)]
+
+    def plan(self, out_folder: str, n_security_shards: int, n_scenario_shards: int = 1) -> List[str]:
+        """Writes one config per non-empty shard plus shard_plan.json; returns the config paths."""
+        if n_security_shards < 1 or n_scenario_shards < 1:
+            raise ValueError(f"Shard counts must be at least 1, got {n_security_shards} security shards "
+                             f"and {n_scenario_shards} scenario shards")
+        dispatcher = self.dispatcher
+        os.makedirs(out_folder, exist_ok=True)
+        base_config = dict(dispatcher.config)
+        for key in ("curve_definition_file", "scenario_definition_file", "security_definition_file"):
+            base_config[key] = path.abspath(path.join(dispatcher.wk_folder, base_config[key]))
+
+        manifest = dispatcher.build_manifest()
+        shards = []
+        for sec_shard in self.security_shards(n_security_shards):
+            for scen_shard in self.scenario_shards(n_scenario_shards):
+                if not sec_shard or not scen_shard:
+                    continue
+                shard_id = len(shards)
+                config = dict(base_config)
+                config["output_file"] = f"results.shard_{shard_id:03d}.csv"
+                config["log_file"] = f"rmds.shard_{shard_id:03d}.log"
+                config["shard"] = {
+                    "id": shard_id,
+                    "security_ids": sec_shard,
+                    "scenarios": [[name, a_date.isoformat()] for name, a_date in scen_shard],
+                }
+                config_file = path.join(out_folder, f"config.shard_{shard_id:03d}.json")
+                with open(config_file, 'w') as f:
+                    json.dump(config, f, indent=2)
+                shards.append({"id": shard_id, "config_file": path.basename(config_file),
+                               "output_file": config["output_file"],
+                               "pairs": len(sec_shard) * len(scen_shard)})
+
+        plan = {
+            "output_file": path.abspath(path.join(dispatcher.wk_folder, dispatcher.config["output_file"])),
+            "by": self.by,
+            "security_ids": list(dispatcher.sec_mgr.securities),
+            "scenarios": [[name, a_date.isoformat()] for name, a_date in dispatcher.scen_mgr.scenarios],
+            "input_manifest": {"securities": manifest.securities, "curves": manifest.curves,
+                               "scenarios": manifest.scenarios},
+            "shards": shards,
+        }
+        with open(path.join(out_folder, PLAN_FILE), 'w') as f:
+            json.dump(plan, f, indent=2)
+        logger.info(f"Planned {len(shards)} shards in {out_folder}: " +
+                    ", ".join(f"{s['id']}={s['pairs']} pairs" for s in shards))
+        return [path.join(out_folder, s["config_file"]) for s in shards]
+
+def run_shards_locally(config_files: List[str], processes: int = 2):
+    """Runs each shard config as its own `python main.py` worker, at most `processes` at a time.
+
+    A new worker starts as soon as any running one finishes.
+    """
+    if processes < 1:
+        raise ValueError(f"Need at least 1 worker process, got {processes}")
+    main_script = path.join(path.dirname(path.abspath(__file__)), "main.py")
+    failed = []
+    with ThreadPoolExecutor(max_workers=processes) as pool:
+        futures = {pool.submit(subprocess.run, [sys.executable, main_script, config_file]): config_file
+                   for config_file in config_files}
+        for future in as_completed(futures):
+            config_file = futures[future]
+            returncode = future.result().returncode
+            if returncode != 0:
+                failed.append(config_file)
+                logger.error(f"Shard worker for {config_file} exited with code {returncode}")
+            else:
+                logger.info(f"Shard worker for {config_file} completed")
+    if failed:
+        raise RuntimeError(f"{len(failed)} shard(s) failed: {failed}")
+
+def check_shard_rows(shard_id: int, shard_def: Dict, shard_results: 'pd.DataFrame'):
+    """Raises unless the shard results hold exactly one row per planned (security, scenario) pair."""
+    expected = {(sid, name, d) for name, d in shard_def["scenarios"] for sid in shard_def["security_ids"]}
+    keys = list(zip(shard_results["Security ID"], shard_results["Scenario Name"], shard_results["Scenario Date"]))
+    found = set(keys)
+    missing = sorted(expected - found)
+    unexpected = sorted(found - expected)
+    if missing:
+        raise ValueError(f"Shard {shard_id} is missing {len(missing)} of {len(expected)} planned rows "
+                         f"(failed or lost pairs, e.g. {missing[:5]}); rerun the shard with --resume")
+    if unexpected:
+        raise ValueError(f"Shard {shard_id} has {len(unexpected)} rows outside its plan, e.g. {unexpected[:5]}")
+    if len(keys) != len(found):
+        raise ValueError(f"Shard {shard_id} has duplicate (security, scenario) rows")
+
+def merge_shards(plan_folder: str, output_file: Optional[str] = None) -> 'pd.DataFrame':
+    """Validates that every shard completed on the planned inputs and writes the combined results.
+
+    A shard counts as complete once its run manifest exists; that manifest must cover exactly the
+    shard's securities and scenarios with the same fingerprints as the plan, and its results must
+    hold exactly one row per planned (security, scenario) pair. Rows are ordered as a single-node
+    run would write them.
+    """
+    import pandas as pd
+    with open(path.join(plan_folder, PLAN_FILE), 'r') as f:
+        plan = json.load(f)
+    planned = plan["input_manifest"]
+    if not plan["shards"]:
+        raise ValueError(f"Shard plan in {plan_folder} has no shards to merge")
+
+    frames = []
+    for shard in plan["shards"]:
+        with open(path.join(plan_folder, shard["config_file"]), 'r') as f:
+            shard_def = json.load(f)["shard"]
+        shard_output = path.join(plan_folder, shard["output_file"])
+        manifest = RunManifest.load(RunManifest.manifest_path(shard_output))
+        if manifest is None or not path.exists(shard_output):
+            raise ValueError(f"Shard {shard['id']} has not completed: no results or manifest for {shard_output}")
+        if set(manifest.securities) != set(shard_def["security_ids"]):
+            raise ValueError(f"Shard {shard['id']} priced securities other than the planned ones")
+        if set(manifest.scenarios) != {f"{name}|{d}" for name, d in shard_def["scenarios"]}:
+            raise ValueError(f"Shard {shard['id']} priced scenarios other than the planned ones")
+        for kind in ("securities", "curves", "scenarios"):
+            mismatched = [k for k, v in getattr(manifest, kind).items() if planned[kind].get(k) != v]
+            if mismatched:
+                raise ValueError(f"Shard {shard['id']} ran on different {kind} than planned: {mismatched[:5]}")
+        shard_results = pd.read_csv(shard_output, dtype={"Security ID": str, "Scenario Name": str,
+                                                         "Scenario Date": str})
+        check_shard_rows(shard["id"], shard_def, shard_results)
+        frames.append(shard_results)
+
+    results = pd.concat(frames, ignore_index=True)
+    keys = list(zip(results["Security ID"], results["Scenario Name"], results["Scenario Date"]))
+    if len(set(keys)) != len(keys):
+        raise ValueError("Shard results contain duplicate (security, scenario) rows")
+    order = {}
+    for name, d in plan["scenarios"]:
+        for security_id in plan["security_ids"]:
+            order[(security_id, name, d)] = len(order)
+    results = (results.assign(_rank=[order[key] for key in keys]).sort_values("_rank")
+               .drop(columns="_rank").reset_index(drop=True))
+
+    output_file = output_file or plan["output_file"]
+    tmp_file = output_file + ".tmp"
+    results.to_csv(tmp_file, index=False)
+    os.replace(tmp_file, output_file)
+    RunManifest(planned["securities"], planned["curves"], planned["scenarios"]).save(
+        RunManifest.manifest_path(output_file))
+    logger.info(f"Merged {len(plan['shards'])} shards into {output_file}: {len(results)} rows")
+    return results
+
+# Example usage:
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Plan, run and merge sharded RMDS runs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_plan = sub.add_parser("plan", help="write shard configs for a dispatcher config")
+    p_plan.add_argument("config_file")
+    p_plan.add_argument("out_folder")
+    p_plan.add_argument("--security-shards", type=int, default=2)
+    p_plan.add_argument("--scenario-shards", type=int, default=1)
+    p_plan.add_argument("--by", choices=["SecId", "Portfolio"], default="SecId")
+    p_run = sub.add_parser("run-local", help="run every shard of a plan as local worker processes")
+    p_run.add_argument("plan_folder")
+    p_run.add_argument("--processes", type=int, default=2)
+    p_merge = sub.add_parser("merge", help="validate shard outputs and combine them into one results file")
+    p_merge.add_argument("plan_folder")
+    p_merge.add_argument("--output-file", default=None)
+    args = parser.parse_args()
+
+    if args.command == "plan":
+        from main import TaskDispatcher
+        # log to the plan folder, leaving the single-node rmds.log in the config folder untouched
+        dispatcher = TaskDispatcher(args.config_file, log_file=path.join(args.out_folder, "rmds.plan.log"))
+        dispatcher.load_curves()
+        dispatcher.load_scenarios()
+        dispatcher.load_securities()
+        for config_file in ShardPlanner(dispatcher, args.by).plan(args.out_folder, args.security_shards,
+                                                                  args.scenario_shards):
+            print(config_file)
+    elif args.command == "run-local":
+        configure_logging(path.join(args.plan_folder, "rmds.run.log"))
+        with open(path.join(args.plan_folder, PLAN_FILE), 'r') as f:
+            plan = json.load(f)
+        run_shards_locally([path.join(args.plan_folder, s["config_file"]) for s in plan["shards"]],
+                           args.processes)
+    elif args.command == "merge":
+        configure_logging(path.join(args.plan_folder, "rmds.merge.log"))
+        merge_shards(args.plan_folder, args.output_file)
@@ -0,0 +1,51 @@
+import json
+import shutil
+import subprocess
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = Path(__file__).resolve().parent
+INPUT_FILES = ["config.JSON", "curves.csv", "scenarios.JSON", "securities.tsv"]
+
+def write_curve_history(curves_file: Path, history_file: Path, n_dates: int = 60, seed: int = 1):
+    """Writes a synthetic history of parallel-bumped snapshots of the curves in curves_file."""
+    import numpy as np
+    sys.path.insert(0, str(REPO_ROOT))
+    from curve_mgr import iter_curves_from_csv
+    rng = np.random.default_rng(seed)
+    base = list(iter_curves_from_csv(str(curves_file)))
+    with open(history_file, 'w') as f:
+        for i in range(n_dates):
+            for curve in base:
+                f.write(f"{curve.name},{(date(2020, 12, 30) - timedelta(days=n_dates - i)).isoformat()},SimpleCurve\n")
+                bump = rng.normal(0, 0.0005)
+                for d, v in zip(curve.day_offsets, curve.dfs):
+                    f.write(f"{int(d)},{v * np.exp(-bump * d / 365.0)}\n")
+                f.write("\n")
+
+def update_json(file_path: Path, **changes):
+    with open(file_path, 'r') as f:
+        data = json.load(f)
+    data.update(changes)
+    with open(file_path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+def run_main(config_file: Path, *args, check: bool = True) -> subprocess.CompletedProcess:
+    # each run gets its own interpreter: the managers are process-wide singletons
+    return subprocess.run([sys.executable, str(REPO_ROOT / "main.py"), str(config_file), *args],
+                          cwd=REPO_ROOT, capture_output=True, text=True, check=check)
+
+@pytest.fixture
+def work_folder(tmp_path) -> Path:
+    """A copy of the example inputs with 50 PCA-simulated scenarios on top of BASE."""
+    for name in INPUT_FILES:
+        shutil.copy(DATA_DIR / name, tmp_path / name)
+    write_curve_history(tmp_path / "curves.csv", tmp_path / "curve_history.csv")
+    update_json(tmp_path / "scenarios.JSON",
+                scenario_generator={"history_file": "curve_history.csv", "method": "simulated",
+                                    "n_scenarios": 50, "n_components": 3, "seed": 7})
+    return tmp_path
@@ -0,0 +1,31 @@
+import subprocess
+import sys
+
+from conftest import REPO_ROOT, run_main, update_json
+
+def run_shard_cli(*args, check: bool = True) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, str(REPO_ROOT / "shard.py"), *map(str, args)],
+                          cwd=REPO_ROOT, capture_output=True, text=True, check=check)
+
+def test_sharded_run_matches_single_node_run(work_folder, tmp_path_factory):
+    config = work_folder / "config.JSON"
+    update_json(config, scenario_block_size=7, security_block_size=1)
+    run_main(config)
+    single_node = (work_folder / "results.csv").read_bytes()
+    single_node_log = (work_folder / "rmds.log").read_text()
+
+    shards = tmp_path_factory.mktemp("shards")
+    merged = shards / "merged.csv"
+    run_shard_cli("plan", config, shards, "--security-shards", 2, "--scenario-shards", 3)
+    run_shard_cli("run-local", shards, "--processes", 3)
+    run_shard_cli("merge", shards, "--output-file", merged)
+
+    assert merged.read_bytes() == single_node
+    # planning logs to the shard folder, not over the single-node log
+    assert (work_folder / "rmds.log").read_text() == single_node_log
+
+def test_plan_rejects_shard_counts_below_one(work_folder, tmp_path_factory):
+    shards = tmp_path_factory.mktemp("shards")
+    result = run_shard_cli("plan", work_folder / "config.JSON", shards, "--security-shards", 0, check=False)
+    assert result.returncode != 0
+    assert "Shard counts must be at least 1" in result.stderr
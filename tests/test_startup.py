@@ -0,0 +1,32 @@
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# cumulative import time of main, in microseconds; the eager scipy/pandas imports used to cost ~740 ms
+STARTUP_BUDGET_US = 400_000
+HEAVY_MODULES = ["pandas", "scipy"]
+
+def run_python(*args):
+    return subprocess.run([sys.executable, *args], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+
+def test_import_main_within_startup_budget():
+    result = run_python("-X", "importtime", "-c", "import main")
+    match = re.search(r"^import time:\s*\d+\s*\|\s*(\d+)\s*\|\s*main\s*$", result.stderr, re.MULTILINE)
+    assert match, "no importtime line for main"
+    cumulative_us = int(match.group(1))
+    assert cumulative_us < STARTUP_BUDGET_US, \
+        f"import main took {cumulative_us / 1000:.0f} ms, budget is {STARTUP_BUDGET_US / 1000:.0f} ms"
+
+def test_import_main_does_not_load_heavy_dependencies():
+    result = run_python("-c", "import sys, main; print(' '.join(sorted(sys.modules)))")
+    loaded = set(result.stdout.split())
+    assert [m for m in HEAVY_MODULES if m in loaded] == []
+
+def test_import_main_has_no_file_side_effects(tmp_path):
+    # importing logger_config must not create, truncate or delete log files
+    subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0, {str(REPO_ROOT)!r}); import main"],
+                   cwd=tmp_path, capture_output=True, text=True, check=True)
+    assert list(tmp_path.iterdir()) == []